@@ -1,22 +1,43 @@
 """REST client handling, including LightspeedStream base class."""
 
-from typing import Any, Dict, Iterable, Optional, Callable
-from pytz import timezone
-from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Callable, Tuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlparse
 import urllib3
 import requests
 from pendulum import parse
 from singer_sdk.authenticators import BasicAuthenticator
 from singer_sdk.streams import RESTStream
-from singer_sdk.exceptions import RetriableAPIError, FatalAPIError
+from singer_sdk.exceptions import (
+    RetriableAPIError,
+    FatalAPIError,
+    InvalidStreamSortException,
+)
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._state import finalize_state_progress_markers, log_sort_error
+from singer_sdk.helpers._typing import conform_record_data_types
+from singer_sdk.helpers._util import utc_now
 import backoff
 import copy
-from time import sleep
+import functools
+import math
+import sys
+from time import perf_counter, sleep
+import hashlib
+import threading
 from cached_property import cached_property
+from tap_lightspeed.conformance import RecordConformer
+from tap_lightspeed.dedupe import RecentKeys
 from tap_lightspeed.exceptions import TooManyRequestsError
+from tap_lightspeed.hash_store import ContentHashStore
+from tap_lightspeed.reference_store import ReferenceStore
+from tap_lightspeed.throttle import AdaptiveThrottle
 from http.client import ImproperConnectionState, RemoteDisconnected
-import singer
-from singer import StateMessage
+from singer import RecordMessage
+
+# Guards Singer output and the shared tap state when streams sync concurrently
+output_lock = threading.RLock()
 
 
 class LightspeedStream(RESTStream):
@@ -30,8 +51,20 @@ class LightspeedStream(RESTStream):
     replication_filter_field = None
     end_date_param = "updated_at_max"
     limit = 250
+    count_path: Optional[str] = None
+    suppress_unchanged_records = False
+    reference_table: Optional[str] = None
+    request_budget = None
+    sync_priority = 0
+    sync_window: Optional[Tuple[datetime, datetime]] = None
+    validated_record_count = 0
+    recovery_seconds = 0.0
     extra_retry_statuses = [429, 404] # there are temporary 404 for order endpoints
 
+    @property
+    def timeout(self) -> int:
+        return self.config.get("request_timeout", 300)
+
     @property
     def authenticator(self) -> BasicAuthenticator:
         """Return a new authenticator object."""
@@ -88,15 +121,49 @@ class LightspeedStream(RESTStream):
         if next_page_token:
             params["page"] = next_page_token
         start_date = self.get_starting_time(context)
+        end_date = self.end_date
+        if self.sync_window:
+            start_date, window_end = self.sync_window
+            end_date = window_end.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
         if self.replication_key:
             if start_date and self.replication_filter_field:
-                params[self.replication_filter_field] = start_date.astimezone(timezone('UTC')).strftime(
+                params[self.replication_filter_field] = start_date.astimezone(timezone.utc).strftime(
                     "%Y-%m-%d %H:%M:%S"
                 )
-            if self.end_date:
-                params[self.end_date_param] = self.end_date
+            if end_date:
+                params[self.end_date_param] = end_date
         return params
 
+    def get_sync_windows(
+        self, parts: int = 1, max_size: Optional[timedelta] = None
+    ) -> List[Tuple[datetime, datetime]]:
+        """Split the range from the bookmark or start_date to end_date or now.
+
+        The range is split into `parts` equal windows, or more if that is needed to
+        keep each window within `max_size`.
+        """
+        start = self.get_starting_time(None)
+        end = parse(self.end_date) if self.end_date else datetime.now(timezone.utc)
+        if max_size:
+            span = (end - start).total_seconds()
+            parts = max(parts, math.ceil(span / max_size.total_seconds()))
+        step = (end - start) / parts
+        return [(start + step * i, start + step * (i + 1)) for i in range(parts)]
+
+    def sync_windows(self, windows: List[Tuple[datetime, datetime]]) -> None:
+        """Sync the stream one `updatedAt` window at a time.
+
+        Each window's sync finalizes the bookmark and writes it, so a sync stopped
+        part way keeps the bookmark of the last completed window.
+        """
+        try:
+            for window in windows:
+                self.sync_window = window
+                self.sync()
+                self._write_state_message(force=True)
+        finally:
+            self.sync_window = None
+
     def clean_values(self, row, field_meta = None):
         for field, value in row.items():
             # clean false values from non boolean fields
@@ -134,7 +201,81 @@ class LightspeedStream(RESTStream):
         row = self.clean_values(row)
         return row
 
+    def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
+        # Records skipped here are not emitted and their child streams are not synced
+        records = super().get_records(context)
+        # Without a replication key a re-fetched record with new content has the
+        # same key as its previous version, so only incremental streams are deduped
+        dedupe = self.config.get("dedupe_records") and self.primary_keys
+        if dedupe and self.replication_key:
+            records = self.drop_repeated_records(records)
+        suppress = self.config.get("suppress_unchanged")
+        # Hashes are only kept for records the stream emits itself
+        if self.suppress_unchanged_records and suppress and self.selected:
+            records = self.drop_unchanged_records(records, context)
+        if self.reference_table and self.config.get("reference_store"):
+            records = self.store_reference_records(records)
+        yield from records
+
+    def store_reference_records(self, records: Iterable[dict]) -> Iterable[dict]:
+        reference_store = ReferenceStore(self.local_store_dir / "reference.sqlite")
+        try:
+            for record in records:
+                reference_store.upsert(self.reference_table, record)
+                yield record
+            reference_store.commit()
+        finally:
+            reference_store.close()
+
+    @cached_property
+    def recent_record_keys(self) -> RecentKeys:
+        return RecentKeys(int(self.config.get("dedupe_cache_size", 100000)))
+
+    def drop_repeated_records(self, records: Iterable[dict]) -> Iterable[dict]:
+        dropped = 0
+        for record in records:
+            key = tuple(record.get(k) for k in self.primary_keys)
+            key += (record.get(self.replication_key),)
+            if self.recent_record_keys.seen(key):
+                dropped += 1
+                continue
+            yield record
+        if dropped:
+            self.logger.info(f"Dropped {dropped} repeated {self.name} records")
+
+    def drop_unchanged_records(
+        self, records: Iterable[dict], context: Optional[dict]
+    ) -> Iterable[dict]:
+        hash_store = ContentHashStore(self.local_store_dir / "content_hashes.sqlite")
+        suppressed = 0
+        try:
+            for record in records:
+                properties = self.schema["properties"]
+                selected = {
+                    field: value
+                    for field, value in record.items()
+                    if field in properties
+                    and field != self.replication_key
+                    and self.mask[("properties", field)]
+                }
+                digest = hash_store.hash_record(selected)
+                if hash_store.is_unchanged(self.name, record.get("id"), digest):
+                    suppressed += 1
+                    # Still move the bookmark past records we don't emit
+                    self._increment_stream_state(record, context=context)
+                    continue
+                yield record
+            hash_store.commit()
+        finally:
+            hash_store.close()
+        self.logger.info(f"Suppressed {suppressed} unchanged {self.name} records")
+
     def request_decorator(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def attempt(*args, **kwargs):
+            self.attempt_started = perf_counter()
+            return func(*args, **kwargs)
+
         decorator: Callable = backoff.on_exception(
             backoff.expo,
             (
@@ -150,27 +291,89 @@ class LightspeedStream(RESTStream):
             ),
             max_tries=10,
             factor=3,
-        )(func)
+            on_backoff=self.on_request_backoff,
+        )(attempt)
         return decorator
+
+    def on_request_backoff(self, details: dict) -> None:
+        """Count the failed attempt and the wait before its retry as recovery time."""
+        self.recovery_seconds += perf_counter() - self.attempt_started + details["wait"]
+        # Failed responses were observed in validate_response; timeouts and dropped
+        # connections never got that far
+        error = sys.exc_info()[1]
+        if not isinstance(error, (RetriableAPIError, TooManyRequestsError)):
+            adaptive_throttle = self.get_adaptive_throttle(details["args"][0].url)
+            if adaptive_throttle:
+                adaptive_throttle.observe_failure()
     
-    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
-        next_page_token: Any = None
-        finished = False
-        decorated_request = self.request_decorator(self._request)
+    @property
+    def local_store_dir(self) -> Path:
+        """Return the directory for data the tap keeps between runs."""
+        return Path(self.config.get("local_store_dir", ".lightspeed"))
+
+    @cached_property
+    def throttle_seconds(self) -> float:
         throttle_seconds = self.config.get("throttle_seconds", 1.3)
         try:
-            throttle_seconds = float(throttle_seconds)
+            return float(throttle_seconds)
         except:
             self.logger.info(f"Not able to convert {throttle_seconds} to a float, using throttle default value 1.3 seconds")
-            throttle_seconds = 1.3
+            return 1.3
+
+    @cached_property
+    def throttle_shop(self) -> str:
+        return hashlib.sha1(
+            f'{self.config.get("base_url")}|{self.config.get("api_key")}'.encode()
+        ).hexdigest()[:12]
+
+    def get_adaptive_throttle(self, url: str) -> Optional[AdaptiveThrottle]:
+        # With the scheduler its shared budget spaces requests, so there is no
+        # spacing to learn from
+        if not self.config.get("adaptive_throttle") or self.request_budget:
+            return None
+        # Endpoint family, e.g. "orders" for /orders.json and /orders/{order_id}/products.json
+        path = urlparse(url).path[len(urlparse(self.url_base).path):]
+        family = path.strip("/").split("/")[0].split(".")[0]
+        return self._tap.throttle_registry.get(f"{self.throttle_shop}:{family}")
+
+    def wait_for_request_slot(self, url: str) -> None:
+        if self.request_budget:
+            # Shared with the other streams synced by the scheduler
+            self.request_budget.acquire(self.sync_priority)
+            return
+        adaptive_throttle = self.get_adaptive_throttle(url)
+        if adaptive_throttle:
+            sleep(adaptive_throttle.interval)
+            return
+        # Wait between requests to avoid hitting 429
+        self.logger.info(f"Waiting between requests to avoid rate limits for {self.throttle_seconds} seconds")
+        sleep(self.throttle_seconds)
+
+    def get_record_count(self, context: Optional[dict]) -> Optional[int]:
+        """Return the number of records the next sync would request, if countable."""
+        if not self.count_path:
+            return None
+        params = self.get_url_params(context, None)
+        params.pop("limit", None)
+        params.pop("page", None)
+        prepared_request = self.prepare_request(context, next_page_token=None)
+        prepared_request.prepare_url(f"{self.url_base}{self.count_path}", params)
+
+        self.wait_for_request_slot(prepared_request.url)
+        resp = self.request_decorator(self._request)(prepared_request, context)
+        return resp.json().get("count")
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        next_page_token: Any = None
+        finished = False
+        decorated_request = self.request_decorator(self._request)
+        recovery_seconds = self.recovery_seconds
 
         while not finished:
             prepared_request = self.prepare_request(
                 context, next_page_token=next_page_token
             )
-            # Wait between requests to avoid hitting 429
-            self.logger.info(f"Waiting between requests to avoid rate limits for {throttle_seconds} seconds")
-            sleep(throttle_seconds)
+            self.wait_for_request_slot(prepared_request.url)
 
             resp = decorated_request(prepared_request, context)
             yield from self.parse_response(resp)
@@ -186,14 +389,26 @@ class LightspeedStream(RESTStream):
             # Cycle until get_next_page_token() no longer returns a value
             finished = not next_page_token
 
+        if self.recovery_seconds > recovery_seconds:
+            self.logger.info(
+                f"Spent {self.recovery_seconds - recovery_seconds:.1f}s recovering "
+                f"from failed '{self.name}' requests"
+            )
+
     def validate_response(self, response: requests.Response) -> None:
+        adaptive_throttle = self.get_adaptive_throttle(response.request.url)
+        if adaptive_throttle:
+            adaptive_throttle.observe(
+                response.status_code, response.elapsed.total_seconds()
+            )
+
         if response.status_code == 429:
             retry_after = response.headers.get("Retry-After")  
             self.logger.info(f"Hit 429. Retry-After: {retry_after}")
 
             try:
                 retry_time = parse(retry_after)
-                retry_after = (retry_time - datetime.now(timezone("UTC"))).total_seconds()
+                retry_after = (retry_time - datetime.now(timezone.utc)).total_seconds()
                 retry_after = max(1, int(retry_after))  
             except Exception:
                 retry_after = 60  # Fallback in case of parsing errors
@@ -211,16 +426,164 @@ class LightspeedStream(RESTStream):
             msg = self.response_error_message(response)
             raise FatalAPIError(msg)
 
-    def _write_state_message(self) -> None:
+    def _write_state_message(self, force: bool = False) -> None:
         """Write out a STATE message with the latest state."""
-        tap_state = self.tap_state
+        with output_lock:
+            tap_state = self.tap_state
+
+            if tap_state and tap_state.get("bookmarks"):
+                for stream_name in list(tap_state.get("bookmarks").keys()):
+                    if tap_state["bookmarks"][stream_name].get("partitions"):
+                        tap_state["bookmarks"][stream_name] = {"partitions": []}
+
+            self._tap.state_writer.write(tap_state, force=force)
+
+    def get_context_state(self, context: Optional[dict]) -> dict:
+        # Without a replication key there is nothing to keep per parent record,
+        # so don't grow one state partition per parent during the sync
+        if not self.replication_key:
+            return self.stream_state
+        with output_lock:
+            return super().get_context_state(context)
+
+    @property
+    def stream_state(self) -> dict:
+        # Creates the stream's bookmark on first access
+        with output_lock:
+            return super().stream_state
+
+    def finalize_state_progress_markers(self, state: Optional[dict] = None) -> None:
+        with output_lock:
+            super().finalize_state_progress_markers(state)
+
+    # NOTE: Same as the SDK's `_sync_records`, with every change to the shared tap
+    # state made under `output_lock`, so a STATE message written by another
+    # stream's thread never serializes the state while it changes. The SDK calls the
+    # module-level `finalize_state_progress_markers` here, so overriding the stream
+    # methods alone doesn't cover it. Check it against the SDK on upgrades.
+    def _sync_records(self, context: Optional[dict] = None) -> None:  # noqa: C901
+        record_count = 0
+        context_list = [context] if context is not None else self.partitions
+        selected = self.selected
+
+        for current_context in context_list or [{}]:
+            partition_record_count = 0
+            current_context = current_context or None
+            state_partition_context = self._get_state_partition_context(current_context)
+            with output_lock:
+                state = self.get_context_state(current_context)
+                self._write_starting_replication_value(current_context)
+            child_context: Optional[dict] = (
+                None if current_context is None else copy.copy(current_context)
+            )
+            for record_result in self.get_records(current_context):
+                if isinstance(record_result, tuple):
+                    # Tuple items should be the record and the child context
+                    record, child_context = record_result
+                else:
+                    record = record_result
+                child_context = copy.copy(
+                    self.get_child_context(record=record, context=child_context)
+                )
+                for key, val in (state_partition_context or {}).items():
+                    # Add state context to records if not already present
+                    if key not in record:
+                        record[key] = val
+
+                # Sync children, except when primary mapper filters out the record
+                if self.stream_maps[0].get_filter_result(record):
+                    self._sync_children(child_context)
+                self._check_max_record_limit(record_count)
+                if selected:
+                    if (record_count - 1) % self.STATE_MSG_FREQUENCY == 0:
+                        self._write_state_message()
+                    self._write_record_message(record)
+                    try:
+                        self._increment_stream_state(record, context=current_context)
+                    except InvalidStreamSortException as ex:
+                        log_sort_error(
+                            log_fn=self.logger.error,
+                            ex=ex,
+                            record_count=record_count + 1,
+                            partition_record_count=partition_record_count + 1,
+                            current_context=current_context,
+                            state_partition_context=state_partition_context,
+                            stream_name=self.name,
+                        )
+                        raise ex
+
+                record_count += 1
+                partition_record_count += 1
+            if current_context == state_partition_context:
+                # Finalize per-partition state only if 1:1 with context
+                with output_lock:
+                    finalize_state_progress_markers(state)
+        if not context:
+            # Finalize total stream only if we have the full full context.
+            # Otherwise will be finalized by tap at end of sync.
+            with output_lock:
+                finalize_state_progress_markers(self.stream_state)
+        self._write_record_count_log(record_count=record_count, context=context)
+        # Reset interim bookmarks before emitting final STATE message:
+        self._write_state_message()
+
+    def _write_schema_message(self) -> None:
+        with output_lock:
+            super()._write_schema_message()
+
+    @cached_property
+    def record_conformer(self) -> RecordConformer:
+        return RecordConformer(self.name, self.schema, self.logger)
+
+    @cached_property
+    def has_deselected_properties(self) -> bool:
+        return not all(self.mask.values())
+
+    def validate_record_sample(self, record: dict) -> None:
+        sample_rate = int(self.config.get("validation_sample_rate") or 0)
+        if not sample_rate:
+            return
+        self.validated_record_count += 1
+        if self.validated_record_count % sample_rate:
+            return
+        for error in self.record_conformer.validate(record):
+            self.logger.warning(f"Record {record.get('id')} of '{self.name}' is invalid: {error}")
+
+    def _generate_record_messages(self, record: dict):
+        # Same as the SDK's `_generate_record_messages` unless fast_conformance is
+        # off, plus the sampled schema validation of the conformed record
+        if not self.config.get("fast_conformance", True):
+            pop_deselected_record_properties(record, self.schema, self.mask, self.logger)
+            record = conform_record_data_types(
+                stream_name=self.name,
+                row=record,
+                schema=self.schema,
+                logger=self.logger,
+            )
+        else:
+            if self.has_deselected_properties:
+                pop_deselected_record_properties(record, self.schema, self.mask, self.logger)
+            record = self.record_conformer.conform(record)
+        self.validate_record_sample(record)
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            # Emit record if not filtered
+            if mapped_record is not None:
+                yield RecordMessage(
+                    stream=stream_map.stream_alias,
+                    record=mapped_record,
+                    version=None,
+                    time_extracted=utc_now(),
+                )
 
-        if tap_state and tap_state.get("bookmarks"):
-            for stream_name in tap_state.get("bookmarks").keys():
-                if tap_state["bookmarks"][stream_name].get("partitions"):
-                    tap_state["bookmarks"][stream_name] = {"partitions": []}
+    def _write_record_message(self, record: dict) -> None:
+        with output_lock:
+            super()._write_record_message(record)
+            self._tap.state_writer.records_since_emit += 1
 
-        singer.write_message(StateMessage(value=tap_state))
+    def _increment_stream_state(self, latest_record, *, context=None) -> None:
+        with output_lock:
+            super()._increment_stream_state(latest_record, context=context)
         
     def get_replication_key_signpost(self, context: Optional[dict]) -> Optional[Any]:
         return None
@@ -0,0 +1,57 @@
+"""Per-stream record conformance and sampled validation."""
+
+import logging
+from typing import Any, Dict, List
+
+from jsonschema import Draft4Validator
+from singer_sdk.helpers._typing import (
+    _warn_unmapped_property,
+    conform_record_data_types,
+    is_boolean_type,
+)
+
+# Types json.loads produces, which need no conversion besides booleans
+JSON_TYPES = frozenset([str, int, float, bool, type(None), list, dict])
+
+
+class RecordConformer:
+    """Conform records to a stream schema with lookups prepared once per stream.
+
+    Produces the same output as the SDK's `conform_record_data_types`, which
+    re-inspects the schema of every property on every record. Values that did not
+    come from JSON (datetimes, bytes...) are still handed to the SDK function.
+    """
+
+    def __init__(self, stream_name: str, schema: dict, logger: logging.Logger) -> None:
+        self.stream_name = stream_name
+        self.schema = schema
+        self.logger = logger
+        properties = schema["properties"]
+        self.properties = frozenset(properties)
+        self.boolean_properties = frozenset(
+            name for name, prop in properties.items() if is_boolean_type(prop)
+        )
+        self.validator = Draft4Validator(schema)
+
+    def conform(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the record with singer-compatible values."""
+        rec: Dict[str, Any] = {}
+        for name, value in row.items():
+            if name not in self.properties:
+                _warn_unmapped_property(self.stream_name, name, self.logger)
+                continue
+            if type(value) not in JSON_TYPES:
+                rec.update(
+                    conform_record_data_types(
+                        self.stream_name, {name: value}, self.schema, self.logger
+                    )
+                )
+            elif name in self.boolean_properties:
+                rec[name] = None if value is None else value != 0
+            else:
+                rec[name] = value
+        return rec
+
+    def validate(self, record: Dict[str, Any]) -> List[str]:
+        """Return the schema validation errors of a record."""
+        return [error.message for error in self.validator.iter_errors(record)]
@@ -0,0 +1,22 @@
+"""Bounded-memory detection of repeated records."""
+
+from collections import OrderedDict
+from typing import Hashable
+
+
+class RecentKeys:
+    """Remember the most recently seen keys, up to a fixed number of them."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.keys: "OrderedDict[Hashable, None]" = OrderedDict()
+
+    def seen(self, key: Hashable) -> bool:
+        """Return True if the key was seen recently, and remember it either way."""
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            return True
+        self.keys[key] = None
+        if len(self.keys) > self.max_size:
+            self.keys.popitem(last=False)
+        return False
@@ -1,3 +1,8 @@
 class TooManyRequestsError(Exception):
     """Exception mapping a ``429 Too Many Requests`` response."""
-    pass
\ No newline at end of file
+    pass
+
+
+class SyncDeadlineReached(Exception):
+    """Raised when a stream is stopped because the run deadline has passed."""
+    pass
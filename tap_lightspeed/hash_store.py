@@ -0,0 +1,67 @@
+"""Per-record content hashes used to suppress unchanged records."""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict
+
+
+class ContentHashStore:
+    """Keep the last emitted content hash of each record in a SQLite file.
+
+    New hashes are staged in a temporary table and only written on `commit`, so
+    records emitted by a sync that fails before committing are compared against
+    the previous hashes next time.
+    """
+
+    def __init__(self, path: Path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit, so lookups don't hold a read lock on the file for the whole
+        # stream while other streams commit their hashes
+        self.connection = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS content_hashes ("
+            "stream TEXT NOT NULL, id TEXT NOT NULL, hash BLOB NOT NULL, "
+            "PRIMARY KEY (stream, id)) WITHOUT ROWID"
+        )
+        self.connection.execute(
+            "CREATE TEMP TABLE pending_hashes ("
+            "stream TEXT NOT NULL, id TEXT NOT NULL, hash BLOB NOT NULL, "
+            "PRIMARY KEY (stream, id)) WITHOUT ROWID"
+        )
+
+    @staticmethod
+    def hash_record(record: Dict[str, Any]) -> bytes:
+        """Return a stable digest of a record's values."""
+        payload = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+    def is_unchanged(self, stream: str, record_id: Any, digest: bytes) -> bool:
+        """Return True if the digest matches the stored one, else stage it."""
+        key = (stream, str(record_id))
+        row = self.connection.execute(
+            "SELECT hash FROM content_hashes WHERE stream = ? AND id = ?", key
+        ).fetchone()
+        if row is not None and row[0] == digest:
+            return True
+        self.connection.execute(
+            "INSERT OR REPLACE INTO pending_hashes (stream, id, hash) "
+            "VALUES (?, ?, ?)",
+            key + (digest,),
+        )
+        return False
+
+    def commit(self) -> None:
+        """Persist the staged hashes."""
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO content_hashes (stream, id, hash) "
+                "SELECT stream, id, hash FROM pending_hashes"
+            )
+            self.connection.execute("DELETE FROM pending_hashes")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
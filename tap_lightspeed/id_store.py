@@ -0,0 +1,45 @@
+"""Compact on-disk id sets used for hard-delete reconciliation."""
+
+import os
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+class IdSetStore:
+    """Persist a sorted set of integer ids as a flat array of 64-bit ints."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def load(self) -> array:
+        """Return the stored ids, or an empty array if nothing was stored yet."""
+        ids = array("q")
+        if self.path.exists():
+            with self.path.open("rb") as f:
+                ids.frombytes(f.read())
+        return ids
+
+    def save(self, ids: array) -> None:
+        """Atomically replace the stored ids."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("wb") as f:
+            ids.tofile(f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def from_ids(ids: Iterable[int]) -> array:
+        """Build a sorted, de-duplicated id array."""
+        return array("q", sorted(set(ids)))
+
+    @staticmethod
+    def missing(previous: array, current: array) -> Iterator[int]:
+        """Yield ids in `previous` that are not in `current`; both must be sorted."""
+        j = 0
+        size = len(current)
+        for record_id in previous:
+            while j < size and current[j] < record_id:
+                j += 1
+            if j == size or current[j] != record_id:
+                yield record_id
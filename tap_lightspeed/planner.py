@@ -0,0 +1,53 @@
+"""Sync planning for tap-lightspeed."""
+
+import math
+from typing import List, Optional
+
+from tap_lightspeed.client import LightspeedStream
+
+
+class SyncPlanner:
+    """Estimate the requests and duration of a sync before extracting.
+
+    Record counts come from the Lightspeed count endpoints, filtered with the same
+    bookmark window the sync would use. Child streams are requested once per parent
+    record, so each selected child adds one request per parent.
+    """
+
+    def __init__(self, streams: List[LightspeedStream]) -> None:
+        self.streams = streams
+
+    def plan_stream(self, stream: LightspeedStream) -> dict:
+        """Return the estimated cost of syncing a top-level stream."""
+        count: Optional[int] = stream.get_record_count(None)
+        children = [
+            child.name
+            for child in stream.child_streams
+            if child.selected or child.has_selected_descendents
+        ]
+
+        if count is None:
+            requests = None
+            duration = None
+        else:
+            page_requests = max(1, math.ceil(count / stream.limit))
+            requests = page_requests + count * len(children)
+            duration = requests * stream.throttle_seconds
+
+        return {
+            "stream": stream.name,
+            "records": count,
+            "child_streams": children,
+            "requests": requests,
+            "estimated_seconds": duration,
+        }
+
+    def plan(self) -> dict:
+        """Return the plan for all streams."""
+        streams = [self.plan_stream(stream) for stream in self.streams]
+        known = [s for s in streams if s["requests"] is not None]
+        return {
+            "streams": streams,
+            "requests": sum(s["requests"] for s in known),
+            "estimated_seconds": sum(s["estimated_seconds"] for s in known),
+        }
@@ -0,0 +1,129 @@
+"""Sync profiling for tap-lightspeed."""
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+]
+
+
+class PeakSampler(threading.Thread):
+    """Keep the tracemalloc snapshot taken at the highest traced memory seen."""
+
+    def __init__(self, interval: float, baseline: tracemalloc.Snapshot) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.highest, _ = tracemalloc.get_traced_memory()
+        self.snapshot = baseline
+        self.stopped = threading.Event()
+
+    def sample(self) -> None:
+        """Take a snapshot if traced memory is above the highest sample so far."""
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.highest:
+            self.highest = current
+            self.snapshot = tracemalloc.take_snapshot()
+
+    def run(self) -> None:
+        """Sample until stopped."""
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+
+class SyncProfiler:
+    """Profile each top-level stream sync and write one report when the run ends.
+
+    Child streams are synced from inside their parent's sync, so their time and
+    allocations are reported under the parent stream. Allocation sites are taken
+    from the snapshot sampled closest to the traced peak and reported as growth
+    since the sync started. When streams run concurrently, tracemalloc figures
+    cover every stream running at that time.
+    """
+
+    def __init__(
+        self, output_path: str, top_n: int = 25, sample_interval: float = 0.1
+    ) -> None:
+        self.output_path = Path(output_path)
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.sections: List[str] = []
+        self._lock = threading.Lock()
+        self._active = 0
+
+    @contextmanager
+    def profile(self, section_name: str) -> Iterator[None]:
+        """Profile the wrapped block with cProfile and tracemalloc."""
+        profiler = cProfile.Profile()
+        with self._lock:
+            if not self._active:
+                tracemalloc.start()
+            self._active += 1
+            baseline = tracemalloc.take_snapshot()
+        sampler = PeakSampler(self.sample_interval, baseline)
+        sampler.start()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            sampler.stopped.set()
+            sampler.join()
+            with self._lock:
+                # Covers blocks shorter than the sampling interval
+                sampler.sample()
+                _, peak = tracemalloc.get_traced_memory()
+                self._active -= 1
+                if not self._active:
+                    tracemalloc.stop()
+            self.sections.append(
+                self._format_section(
+                    section_name,
+                    elapsed,
+                    peak,
+                    profiler,
+                    sampler.snapshot.filter_traces(SNAPSHOT_FILTERS),
+                    baseline.filter_traces(SNAPSHOT_FILTERS),
+                )
+            )
+
+    def _format_section(
+        self,
+        section_name: str,
+        elapsed: float,
+        peak: int,
+        profiler: cProfile.Profile,
+        snapshot: tracemalloc.Snapshot,
+        baseline: tracemalloc.Snapshot,
+    ) -> str:
+        out = io.StringIO()
+        out.write(f"=== {section_name} ===\n")
+        out.write(f"wall time: {elapsed:.2f}s\n")
+        out.write(f"peak traced memory: {peak / 1024 / 1024:.2f} MiB\n\n")
+
+        for sort_key in ("tottime", "cumulative"):
+            out.write(f"--- top functions by {sort_key} ---\n")
+            stats = pstats.Stats(profiler, stream=out)
+            stats.sort_stats(sort_key).print_stats(self.top_n)
+
+        out.write("--- top allocation sites at peak ---\n")
+        for stat in snapshot.compare_to(baseline, "lineno")[: self.top_n]:
+            out.write(f"{stat}\n")
+        out.write("\n")
+        return out.getvalue()
+
+    def write_report(self) -> Path:
+        """Write all collected sections to the output file."""
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_path.write_text("".join(self.sections))
+        return self.output_path
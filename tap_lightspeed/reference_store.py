@@ -0,0 +1,58 @@
+"""Local store of the latest product and variant rows."""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ReferenceStore:
+    """Keep the latest emitted row of each product and variant in a SQLite file.
+
+    Rows are indexed by id, so looking up the product or variant of an order line
+    is a single primary key lookup. Staged rows are written every `batch_size`
+    rows and on `commit`.
+    """
+
+    tables = ("products", "variants")
+    batch_size = 1000
+
+    def __init__(self, path: Path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(path), timeout=60)
+        for table in self.tables:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(id INTEGER PRIMARY KEY, data TEXT NOT NULL)"
+            )
+        self.pending: Dict[str, List[Tuple[int, str]]] = {}
+        self.pending_rows = 0
+
+    def upsert(self, table: str, record: Dict[str, Any]) -> None:
+        """Stage the latest version of a row."""
+        data = json.dumps(record, default=str)
+        self.pending.setdefault(table, []).append((record["id"], data))
+        self.pending_rows += 1
+        if self.pending_rows >= self.batch_size:
+            self.commit()
+
+    def commit(self) -> None:
+        """Persist the staged rows."""
+        with self.connection:
+            for table, rows in self.pending.items():
+                self.connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)", rows
+                )
+        self.pending.clear()
+        self.pending_rows = 0
+
+    def get(self, table: str, record_id: Any) -> Optional[Dict[str, Any]]:
+        """Return the stored row with the given id."""
+        row = self.connection.execute(
+            f"SELECT data FROM {table} WHERE id = ?", (record_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
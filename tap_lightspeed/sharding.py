@@ -0,0 +1,153 @@
+"""Sharded extraction of one stream across local worker processes."""
+
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from pendulum import parse
+from singer_sdk import Tap
+
+from tap_lightspeed.client import LightspeedStream, output_lock
+
+# Settings that only make sense in the coordinating process
+COORDINATOR_SETTINGS = [
+    "shard_workers",
+    "shard_streams",
+    "max_concurrent_streams",
+    "stream_priorities",
+    "sync_deadline_seconds",
+    "profile",
+    "dry_run",
+    "watch",
+    "watch_interval_seconds",
+    "watch_streams",
+    "watch_max_polls",
+    # Workers keep the fixed spacing that shares the configured rate between them
+    "adaptive_throttle",
+]
+
+
+class ShardCoordinator:
+    """Split a stream's bookmark window into `updatedAt` shards synced by workers.
+
+    Each worker is a separate tap process limited to the stream (and its child
+    streams) with its own `start_date`/`end_date` window. Records are forwarded as
+    they arrive; the stream's bookmark only advances once every shard finished.
+    """
+
+    def __init__(self, tap: Tap, stream: LightspeedStream, workers: int) -> None:
+        self.tap = tap
+        self.stream = stream
+        self.workers = workers
+        self.logger = tap.logger
+
+    def get_windows(self) -> List[Tuple[datetime, datetime]]:
+        """Split the stream's window into one slice per worker."""
+        return self.stream.get_sync_windows(self.workers)
+
+    def get_worker_config(self, window: Tuple[datetime, datetime]) -> dict:
+        """Return the config of the worker syncing the given window."""
+        config = {
+            key: value
+            for key, value in self.tap.config.items()
+            if key not in COORDINATOR_SETTINGS
+        }
+        config["start_date"] = window[0].isoformat()
+        config["end_date"] = window[1].strftime("%Y-%m-%d %H:%M:%S")
+        config["shard_stream"] = self.stream.name
+        # Keep the combined request rate of all workers at the configured rate
+        config["throttle_seconds"] = self.stream.throttle_seconds * self.workers
+        return config
+
+    def forward_output(self, output: Iterable[str], states: List[dict]) -> None:
+        """Forward a worker's messages and collect its STATE values in `states`."""
+        for line in output:
+            # Records are the bulk of the output, forward them without parsing
+            if line.startswith('{"type": "RECORD"'):
+                with output_lock:
+                    sys.stdout.write(line)
+                continue
+            message = json.loads(line)
+            if message["type"] == "STATE":
+                states.append(message["value"])
+            elif message["type"] != "SCHEMA":
+                with output_lock:
+                    sys.stdout.write(line)
+
+    def merge_bookmark(self, states: List[dict]) -> Optional[str]:
+        """Return the latest bookmark of the stream across the final shard states."""
+        values = [
+            state["bookmarks"][self.stream.name]["replication_key_value"]
+            for state in states
+            if state.get("bookmarks", {})
+            .get(self.stream.name, {})
+            .get("replication_key_value")
+        ]
+        return max(values, key=parse) if values else None
+
+    def run(self) -> None:
+        """Sync the stream through the worker processes."""
+        for stream in [self.stream] + self.stream.descendent_streams:
+            if stream.selected:
+                stream._write_schema_message()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            catalog_path = Path(tmp_dir) / "catalog.json"
+            catalog_path.write_text(json.dumps(self.tap.catalog.to_dict()))
+
+            workers = []
+            for i, window in enumerate(self.get_windows()):
+                config_path = Path(tmp_dir) / f"config_{i}.json"
+                config_path.write_text(json.dumps(self.get_worker_config(window)))
+                self.logger.info(
+                    f"Starting shard {i} of '{self.stream.name}' "
+                    f"for {window[0]} - {window[1]}"
+                )
+                worker = subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "tap_lightspeed.tap",
+                        "--config",
+                        str(config_path),
+                        "--catalog",
+                        str(catalog_path),
+                    ],
+                    stdout=subprocess.PIPE,
+                    text=True,
+                )
+                states: List[dict] = []
+                reader = threading.Thread(
+                    target=self.forward_output, args=(worker.stdout, states)
+                )
+                reader.start()
+                workers.append((worker, reader, states))
+
+            failed = 0
+            final_states = []
+            for worker, reader, states in workers:
+                reader.join()
+                if worker.wait() != 0:
+                    failed += 1
+                elif states:
+                    final_states.append(states[-1])
+            sys.stdout.flush()
+
+        if failed:
+            raise RuntimeError(
+                f"{failed} of {self.workers} shards of '{self.stream.name}' failed, "
+                "bookmark not advanced."
+            )
+
+        bookmark = self.merge_bookmark(final_states)
+        if bookmark:
+            with output_lock:
+                state = self.stream.stream_state
+                state["replication_key"] = self.stream.replication_key
+                state["replication_key_value"] = bookmark
+        self.stream._write_state_message(force=True)
@@ -0,0 +1,34 @@
+"""Coalesced STATE emission."""
+
+import time
+
+import singer
+from singer import StateMessage
+
+
+class StateWriter:
+    """Emit STATE messages at most every `interval_seconds` or `interval_records`.
+
+    States written before either interval has passed are dropped, since the next
+    emitted state supersedes them. Forced writes are always emitted.
+    """
+
+    def __init__(self, interval_seconds: float = 0, interval_records: int = 0) -> None:
+        self.interval_seconds = interval_seconds
+        self.interval_records = interval_records
+        self.records_since_emit = 0
+        self.last_emit = time.monotonic()
+
+    def is_due(self) -> bool:
+        """Return True once enough time or records passed since the last emit."""
+        if self.interval_records and self.records_since_emit >= self.interval_records:
+            return True
+        return time.monotonic() - self.last_emit >= self.interval_seconds
+
+    def write(self, state: dict, force: bool = False) -> None:
+        """Emit the state if forced or due."""
+        if not force and not self.is_due():
+            return
+        singer.write_message(StateMessage(value=state))
+        self.records_since_emit = 0
+        self.last_emit = time.monotonic()
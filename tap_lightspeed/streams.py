@@ -1,8 +1,15 @@
 """Stream type classes for tap-lightspeed."""
 
+import itertools
+import threading
+from datetime import datetime, timezone
+
+from cached_property import cached_property
 from singer_sdk import typing as th
 
 from tap_lightspeed.client import LightspeedStream
+from tap_lightspeed.id_store import IdSetStore
+from tap_lightspeed.reference_store import ReferenceStore
 
 tax_rates = th.ObjectType(
     th.Property("name", th.StringType),
@@ -82,6 +89,7 @@ class OrdersStream(LightspeedStream):
 
     name = "orders"
     path = "/orders.json"
+    count_path = "/orders/count.json"
     primary_keys = ["id"]
     records_jsonpath = "$.orders[*]"
     replication_key = "updatedAt"
@@ -240,8 +248,45 @@ class OrderLinesStream(LightspeedStream):
         th.Property("order_id", th.IntegerType),
         th.Property("product", resources),
         th.Property("variant", resources),
+        th.Property("productDetails", th.CustomType({"type": ["object", "null"]})),
+        th.Property("variantDetails", th.CustomType({"type": ["object", "null"]})),
     ).to_dict()
 
+    @cached_property
+    def reference_stores(self) -> threading.local:
+        return threading.local()
+
+    @property
+    def reference_store(self) -> ReferenceStore:
+        # Opened once per thread and kept for the parent's sync: SQLite connections
+        # can't be shared between threads, and with the scheduler each watch poll
+        # syncs the stream on a new thread. Closed when the thread ends.
+        local = self.reference_stores
+        if not hasattr(local, "store"):
+            local.store = ReferenceStore(self.local_store_dir / "reference.sqlite")
+        return local.store
+
+    def enrich(self, record, link, table, fields):
+        resource = (record.get(link) or {}).get("resource") or {}
+        if not fields or not resource.get("id"):
+            return None
+        row = self.reference_store.get(table, resource["id"])
+        if row is None:
+            return None
+        return {field: row.get(field) for field in fields}
+
+    def post_process(self, record, context):
+        super().post_process(record, context)
+        enrich_fields = self.config.get("enrich_order_lines")
+        if enrich_fields:
+            record["productDetails"] = self.enrich(
+                record, "product", "products", enrich_fields.get("product")
+            )
+            record["variantDetails"] = self.enrich(
+                record, "variant", "variants", enrich_fields.get("variant")
+            )
+        return record
+
 
 class OrderMetafieldsStream(LightspeedStream):
     """Define custom stream."""
@@ -302,6 +347,9 @@ class ProductsStream(LightspeedStream):
 
     name = "products"
     path = "/products.json"
+    count_path = "/products/count.json"
+    suppress_unchanged_records = True
+    reference_table = "products"
     primary_keys = ["id"]
     replication_key = "updatedAt"
     replication_filter_field = "updated_at_min"
@@ -368,6 +416,9 @@ class VariantsStream(LightspeedStream):
 
     name = "variants"
     path = "/variants.json"
+    count_path = "/variants/count.json"
+    suppress_unchanged_records = True
+    reference_table = "variants"
     primary_keys = ["id"]
     records_jsonpath = "$.variants[*]"
     replication_key = "updatedAt"
@@ -502,6 +553,7 @@ class CategoriesStream(LightspeedStream):
 
     name = "categories"
     path = "/categories.json"
+    count_path = "/categories/count.json"
     primary_keys = ["id"]
     replication_key = "updatedAt"
     replication_filter_field = "updated_at_min"
@@ -564,6 +616,7 @@ class SuppliersStream(LightspeedStream):
 
     name = "suppliers"
     path = "/suppliers.json"
+    count_path = "/suppliers/count.json"
     primary_keys = ["id"]
     replication_key = "updatedAt"
     replication_filter_field = "updated_at_min"
@@ -590,6 +643,7 @@ class CustomersStream(LightspeedStream):
 
     name = "customers"
     path = "/customers.json"
+    count_path = "/customers/count.json"
     primary_keys = ["id"]
     replication_key = "updatedAt"
     replication_filter_field = "updated_at_min"
@@ -655,6 +709,7 @@ class ReturnsStream(LightspeedStream):
 
     name = "returns"
     path = "/returns.json"
+    count_path = "/returns/count.json"
     primary_keys = ["id"]
     replication_key = "updatedAt"
     replication_filter_field = "updated_at_min"
@@ -686,3 +741,85 @@ class ReturnsStream(LightspeedStream):
             ),
         ),
     ).to_dict()
+
+
+class DeletedRecordsStream(LightspeedStream):
+    """Detect hard deletes by diffing the current ids against the previous scan."""
+
+    name = "deleted_records"
+    path = "/{resource}.json"
+    primary_keys = ["resource", "id"]
+    records_jsonpath = "$.*[*]"
+    reconciled_streams = [
+        "orders",
+        "products",
+        "variants",
+        "categories",
+        "suppliers",
+        "customers",
+        "returns",
+    ]
+    schema = th.PropertiesList(
+        th.Property("resource", th.StringType),
+        th.Property("id", th.IntegerType),
+        th.Property("deletedAt", th.DateTimeType),
+    ).to_dict()
+
+    @property
+    def partitions(self):
+        resources = self.config.get("reconcile_streams") or self.reconciled_streams
+        return [{"resource": resource} for resource in resources]
+
+    def get_url_params(self, context, next_page_token):
+        params = super().get_url_params(context, next_page_token)
+        params["fields"] = "id"
+        return params
+
+    def request_records(self, context):
+        resource = context["resource"]
+        store = IdSetStore(self.local_store_dir / "ids" / f"{resource}.bin")
+        candidate_store = IdSetStore(
+            self.local_store_dir / "ids" / f"{resource}.missing.bin"
+        )
+        previous = store.load()
+        candidates = set(candidate_store.load())
+        current = IdSetStore.from_ids(
+            record["id"] for record in super().request_records(context)
+        )
+
+        # Pages shift while records are deleted during the scan, so an id missing
+        # from one scan may be live. Only ids missing from two consecutive scans
+        # are reported; the others are kept and checked again next time.
+        deleted_at = datetime.now(timezone.utc).isoformat()
+        deleted = 0
+        unconfirmed = []
+        for record_id in IdSetStore.missing(previous, current):
+            if record_id not in candidates:
+                unconfirmed.append(record_id)
+                continue
+            deleted += 1
+            yield {"resource": resource, "id": record_id, "deletedAt": deleted_at}
+        self.logger.info(
+            f"Found {deleted} deleted {resource} out of {len(previous)} known ids, "
+            f"{len(unconfirmed)} more missing ids are confirmed on the next scan"
+        )
+        store.save(IdSetStore.from_ids(itertools.chain(current, unconfirmed)))
+        candidate_store.save(IdSetStore.from_ids(unconfirmed))
+
+
+STREAM_TYPES = [
+    ShopStream,
+    OrdersStream,
+    OrderLinesStream,
+    OrderMetafieldsStream,
+    ShipmentsLinesStream,
+    ProductsStream,
+    VariantsStream,
+    ProductsImagesStream,
+    ProductsMetafieldsStream,
+    CategoriesStream,
+    CategoriesProductStream,
+    SuppliersStream,
+    CustomersStream,
+    ReturnsStream,
+]
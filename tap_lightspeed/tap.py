@@ -1,12 +1,23 @@
 """Lightspeed tap class."""
 
-import inspect
-from typing import List
+import json
+import time
+from datetime import datetime, timedelta
+from contextlib import nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
 
+from cached_property import cached_property
 from singer_sdk import Stream, Tap
 from singer_sdk import typing as th
 
-from tap_lightspeed import streams
+# The sync helpers are imported where they are used, so `--version` and `--about`
+# don't load them
+if TYPE_CHECKING:
+    from tap_lightspeed.scheduler import StreamScheduler
+    from tap_lightspeed.sharding import ShardCoordinator
+    from tap_lightspeed.state import StateWriter
+    from tap_lightspeed.throttle import AdaptiveThrottleRegistry
 
 
 class TapLightspeed(Tap):
@@ -27,15 +38,385 @@ class TapLightspeed(Tap):
         ),
         th.Property("api_key", th.StringType, required=True),
         th.Property("api_secret", th.StringType, required=True),
+        th.Property(
+            "request_timeout",
+            th.NumberType,
+            default=300,
+            description="Seconds to wait for a response before retrying.",
+        ),
+        th.Property(
+            "profile",
+            th.BooleanType,
+            default=False,
+            description="Run the sync under cProfile and tracemalloc.",
+        ),
+        th.Property(
+            "profile_output",
+            th.StringType,
+            default="profile_report.txt",
+            description="File the per-stream profiling report is written to.",
+        ),
+        th.Property(
+            "dry_run",
+            th.BooleanType,
+            default=False,
+            description="Print the estimated sync plan instead of syncing.",
+        ),
+        th.Property(
+            "local_store_dir",
+            th.StringType,
+            default=".lightspeed",
+            description="Directory for data the tap keeps between runs.",
+        ),
+        th.Property(
+            "reconcile_deletes",
+            th.BooleanType,
+            default=False,
+            description="Add the deleted_records stream, which scans ids only.",
+        ),
+        th.Property(
+            "reconcile_streams",
+            th.ArrayType(th.StringType),
+            description="Streams the deleted_records stream reconciles.",
+        ),
+        th.Property(
+            "suppress_unchanged",
+            th.BooleanType,
+            default=False,
+            description="Skip products and variants whose content hash is unchanged.",
+        ),
+        th.Property(
+            "max_concurrent_streams",
+            th.IntegerType,
+            default=1,
+            description="Number of top-level streams synced at the same time.",
+        ),
+        th.Property(
+            "stream_priorities",
+            th.ObjectType(),
+            description="Map of stream name to priority; higher syncs first.",
+        ),
+        th.Property(
+            "sync_deadline_seconds",
+            th.NumberType,
+            description="Stop and checkpoint unfinished streams after this long.",
+        ),
+        th.Property(
+            "sync_window_days",
+            th.NumberType,
+            default=7,
+            description="Size of the updatedAt windows synced under a deadline.",
+        ),
+        th.Property(
+            "shard_workers",
+            th.IntegerType,
+            default=1,
+            description="Number of worker processes for the streams in shard_streams.",
+        ),
+        th.Property(
+            "shard_streams",
+            th.ArrayType(th.StringType),
+            description="Incremental top-level streams synced in updatedAt shards.",
+        ),
+        th.Property(
+            "shard_stream",
+            th.StringType,
+            description="Set by the shard coordinator on its worker processes.",
+        ),
+        th.Property(
+            "watch",
+            th.BooleanType,
+            default=False,
+            description="Keep running and poll streams for changes after the sync.",
+        ),
+        th.Property(
+            "watch_interval_seconds",
+            th.NumberType,
+            default=60,
+            description="Seconds to wait between polls in watch mode.",
+        ),
+        th.Property(
+            "watch_streams",
+            th.ArrayType(th.StringType),
+            description="Streams polled in watch mode, all incremental ones if unset.",
+        ),
+        th.Property(
+            "watch_max_polls",
+            th.IntegerType,
+            description="Stop watch mode after this many polls.",
+        ),
+        th.Property(
+            "fast_conformance",
+            th.BooleanType,
+            default=True,
+            description="Conform records with per-stream prepared schema lookups.",
+        ),
+        th.Property(
+            "validation_sample_rate",
+            th.IntegerType,
+            default=0,
+            description="Validate 1 in N emitted records against the schema; 0 is off.",
+        ),
+        th.Property(
+            "dedupe_records",
+            th.BooleanType,
+            default=False,
+            description="Drop records repeated with the same key and updatedAt.",
+        ),
+        th.Property(
+            "dedupe_cache_size",
+            th.IntegerType,
+            default=100000,
+            description="Number of recent record keys remembered per stream.",
+        ),
+        th.Property(
+            "reference_store",
+            th.BooleanType,
+            default=False,
+            description="Keep the latest products and variants in a local store.",
+        ),
+        th.Property(
+            "enrich_order_lines",
+            th.ObjectType(
+                th.Property("product", th.ArrayType(th.StringType)),
+                th.Property("variant", th.ArrayType(th.StringType)),
+            ),
+            description="Product and variant fields attached to order lines.",
+        ),
+        th.Property(
+            "state_interval_seconds",
+            th.NumberType,
+            default=30,
+            description="Minimum seconds between STATE messages within a stream.",
+        ),
+        th.Property(
+            "state_interval_records",
+            th.IntegerType,
+            default=10000,
+            description="Emit a STATE message after this many records regardless.",
+        ),
+        th.Property(
+            "adaptive_throttle",
+            th.BooleanType,
+            default=False,
+            description="Learn the spacing between requests per shop and endpoint.",
+        ),
+        th.Property(
+            "min_throttle_seconds",
+            th.NumberType,
+            default=0.1,
+            description="Lower bound of the learned spacing between requests.",
+        ),
     ).to_dict()
 
+    @cached_property
+    def state_writer(self) -> "StateWriter":
+        """Return the writer that coalesces STATE messages."""
+        from tap_lightspeed.state import StateWriter
+
+        return StateWriter(
+            interval_seconds=float(self.config.get("state_interval_seconds", 30)),
+            interval_records=int(self.config.get("state_interval_records", 10000)),
+        )
+
+    @cached_property
+    def throttle_registry(self) -> "AdaptiveThrottleRegistry":
+        """Return the learned request spacing per shop and endpoint family."""
+        from tap_lightspeed.throttle import AdaptiveThrottleRegistry
+
+        store_dir = Path(self.config.get("local_store_dir", ".lightspeed"))
+        return AdaptiveThrottleRegistry(
+            store_dir / "throttle.json",
+            default_interval=next(iter(self.streams.values())).throttle_seconds,
+            min_interval=float(self.config.get("min_throttle_seconds", 0.1)),
+        )
+
     def discover_streams(self) -> List[Stream]:
         """Return a list of discovered streams."""
-        return [
-            cls(self)
-            for _, cls in inspect.getmembers(streams, inspect.isclass)
-            if cls.__module__ == "tap_lightspeed.streams" and hasattr(cls, "name")
-        ]
+        # Imported here so `--version` and `--about` don't build the stream schemas
+        from tap_lightspeed.streams import STREAM_TYPES, DeletedRecordsStream
+
+        stream_types = list(STREAM_TYPES)
+        if self.config.get("reconcile_deletes"):
+            stream_types.append(DeletedRecordsStream)
+        return [cls(self) for cls in stream_types]
+
+    def get_top_level_streams(self) -> List[Stream]:
+        """Return the selected streams that are not synced through a parent."""
+        top_level = []
+        for stream in self.streams.values():
+            if not stream.selected and not stream.has_selected_descendents:
+                self.logger.info(f"Skipping deselected stream '{stream.name}'.")
+                continue
+            if stream.parent_stream_type:
+                continue
+            if self.config.get("shard_stream") not in (None, stream.name):
+                continue
+            top_level.append(stream)
+        if self.config.get("reference_store"):
+            # The SDK orders streams by name; sync the stored products and variants
+            # first, so order lines are enriched with this run's rows
+            top_level.sort(key=lambda stream: not stream.reference_table)
+        return top_level
+
+    def run_plan(self) -> dict:
+        """Estimate the cost of syncing the selected streams and print the plan."""
+        from tap_lightspeed.planner import SyncPlanner
+
+        plan = SyncPlanner(self.get_top_level_streams()).plan()
+        for stream_plan in plan["streams"]:
+            self.logger.info(
+                f"Plan for '{stream_plan['stream']}': "
+                f"{stream_plan['records']} records, "
+                f"{stream_plan['requests']} requests, "
+                f"~{stream_plan['estimated_seconds']} seconds"
+            )
+        print(json.dumps(plan, indent=2))
+        return plan
+
+    def get_scheduler(self) -> Optional["StreamScheduler"]:
+        """Return a stream scheduler if concurrency, priorities or a deadline is set."""
+        from tap_lightspeed.scheduler import RequestBudget, StreamScheduler
+
+        max_workers = int(self.config.get("max_concurrent_streams") or 1)
+        priorities = self.config.get("stream_priorities")
+        deadline_seconds = self.config.get("sync_deadline_seconds")
+        if max_workers <= 1 and not priorities and deadline_seconds is None:
+            return None
+
+        # Called for the initial sync and each watch poll, so each gets its own
+        # deadline and a poll after a stopped sync can still make progress
+        deadline = None
+        if deadline_seconds is not None:
+            deadline = time.monotonic() + float(deadline_seconds)
+        throttle_seconds = next(iter(self.streams.values())).throttle_seconds
+        return StreamScheduler(
+            RequestBudget(throttle_seconds, deadline),
+            self.logger,
+            max_workers=max_workers,
+            priorities=priorities,
+        )
+
+    def get_deadline_windows(
+        self, stream: Stream
+    ) -> Optional[List[Tuple[datetime, datetime]]]:
+        """Return the windows to sync an incremental stream in under a deadline."""
+        budget = getattr(stream, "request_budget", None)
+        if not budget or budget.deadline is None:
+            return None
+        if not stream.replication_key or not stream.get_starting_time(None):
+            return None
+        window_days = float(self.config.get("sync_window_days", 7))
+        return stream.get_sync_windows(max_size=timedelta(days=window_days))
+
+    def get_shard_coordinator(self, stream: Stream) -> Optional["ShardCoordinator"]:
+        """Return a shard coordinator if the stream is configured for sharding."""
+        from tap_lightspeed.sharding import ShardCoordinator
+
+        workers = int(self.config.get("shard_workers") or 1)
+        if workers <= 1 or stream.name not in (self.config.get("shard_streams") or []):
+            return None
+        if not stream.replication_key or not stream.get_starting_time(None):
+            self.logger.warning(
+                f"'{stream.name}' needs a replication key and a start_date or "
+                "bookmark to be sharded, syncing it in this process."
+            )
+            return None
+        if getattr(stream, "request_budget", None):
+            # Workers can't take slots of the scheduler's request budget or stop at
+            # its deadline
+            self.logger.warning(
+                f"'{stream.name}' is not sharded while streams are scheduled, "
+                "syncing it in this process."
+            )
+            return None
+        return ShardCoordinator(self, stream, workers)
+
+    def sync_top_level_stream(self, stream: Stream) -> None:
+        """Sync a stream in shards, in deadline windows or in one pass."""
+        coordinator = self.get_shard_coordinator(stream)
+        windows = None if coordinator else self.get_deadline_windows(stream)
+        if coordinator:
+            coordinator.run()
+        elif windows:
+            stream.sync_windows(windows)
+        else:
+            stream.sync()
+
+    def watch(self, sync_streams: Callable[[List[Stream]], None]) -> None:
+        """Poll the watched streams from their latest bookmarks until stopped.
+
+        The same stream objects are reused, so HTTP sessions stay open and each
+        poll starts from the bookmark the previous one finalized.
+        """
+        interval = float(self.config.get("watch_interval_seconds", 60))
+        names = self.config.get("watch_streams")
+        max_polls = self.config.get("watch_max_polls")
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            self.logger.info(f"Next poll in {interval} seconds")
+            time.sleep(interval)
+            self._reset_state_progress_markers()
+            streams = [
+                stream
+                for stream in self.get_top_level_streams()
+                if (stream.name in names if names else stream.replication_key)
+            ]
+            sync_streams(streams)
+            polls += 1
+
+    # NOTE: `Tap.sync_all` is marked @final in the SDK. This override keeps its steps
+    # (reset progress markers, set replication methods, sync and finalize each
+    # selected top-level stream) and adds dry runs, profiling, scheduling, sharding
+    # and watch mode around them. Check it against `Tap.sync_all` on SDK upgrades.
+    def sync_all(self) -> None:  # type: ignore[misc]
+        """Sync all streams."""
+        if self.config.get("dry_run"):
+            self.run_plan()
+            return
+
+        profiler = None
+        if self.config.get("profile"):
+            from tap_lightspeed.profiling import SyncProfiler
+
+            profiler = SyncProfiler(
+                self.config.get("profile_output", "profile_report.txt")
+            )
+        polls = 0
+
+        def sync_stream(stream: Stream) -> None:
+            section = f"{stream.name} (poll {polls})" if polls else stream.name
+            with profiler.profile(section) if profiler else nullcontext():
+                self.sync_top_level_stream(stream)
+            stream.finalize_state_progress_markers()
+            stream._write_state_message(force=True)
+
+        def sync_streams(streams: List[Stream]) -> None:
+            nonlocal polls
+            scheduler = self.get_scheduler()
+            if scheduler:
+                scheduler.run(streams, sync_stream)
+            else:
+                for stream in streams:
+                    sync_stream(stream)
+            polls += 1
+
+        self._reset_state_progress_markers()
+        self._set_compatible_replication_methods()
+        try:
+            sync_streams(self.get_top_level_streams())
+            if self.config.get("watch"):
+                self.watch(sync_streams)
+        finally:
+            scheduled = any(
+                getattr(stream, "request_budget", None)
+                for stream in self.streams.values()
+            )
+            if self.config.get("adaptive_throttle") and not scheduled:
+                self.throttle_registry.save()
+            if profiler:
+                report = profiler.write_report()
+                self.logger.info(f"Profiling report written to {report}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+"""Shared fixtures for the tap-lightspeed tests."""
+
+from typing import Callable
+
+import pytest
+
+from tap_lightspeed.tap import TapLightspeed
+
+
+@pytest.fixture
+def sample_config(tmp_path) -> dict:
+    """Return a minimal valid config keeping local data in the test's tmp dir."""
+    return {
+        "base_url": "https://api.webshopapp.com",
+        "language": "en",
+        "api_key": "key",
+        "api_secret": "secret",
+        "local_store_dir": str(tmp_path),
+    }
+
+
+@pytest.fixture
+def make_tap(sample_config) -> Callable[..., TapLightspeed]:
+    """Return a factory building a tap from the sample config and overrides."""
+
+    def make_tap(**overrides) -> TapLightspeed:
+        return TapLightspeed(config={**sample_config, **overrides})
+
+    return make_tap
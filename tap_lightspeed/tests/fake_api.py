@@ -0,0 +1,182 @@
+"""Local stand-in for the Lightspeed API that injects faults."""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeLightspeedAPI:
+    """Serve `/orders.json` pages and fail requests on a fixed schedule.
+
+    Order `i` is updated `updated_step * i` after 2022-01-01 and orders are
+    filtered on `updated_at_min`/`updated_at_max`. Count endpoints answer with
+    the number of orders for `/orders/count.json` and 0 for other resources.
+    Every requested path is kept in `paths`.
+
+    `fault_every` maps a fault to N, injecting it on every Nth request:
+    ``"404"`` (the temporary 404 of the order endpoints), ``"500"``, ``"drop"``
+    (close the connection without a response) and ``"timeout"`` (answer after
+    `timeout_seconds`). At most `rate_limit` requests are answered per
+    `rate_window` seconds; the rest get a 429 with a Retry-After. `on_page` is
+    called with the page number once a page of orders is read, before it is sent.
+    """
+
+    def __init__(
+        self,
+        orders: int = 1000,
+        fault_every: Optional[Dict[str, int]] = None,
+        rate_limit: Optional[int] = None,
+        rate_window: float = 1.0,
+        timeout_seconds: float = 2.0,
+        updated_step: timedelta = timedelta(0),
+    ) -> None:
+        updated = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        self.orders = [
+            {
+                "id": i,
+                "updatedAt": (updated + updated_step * i).isoformat(),
+                "priceIncl": "10.5",
+            }
+            for i in range(1, orders + 1)
+        ]
+        self.fault_every = fault_every or {}
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.timeout_seconds = timeout_seconds
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.faults: Dict[str, int] = {}
+        self.requests = 0
+        self.paths: List[str] = []
+        self.on_page: Optional[Callable[[int], None]] = None
+        handler = type("Handler", (FakeLightspeedHandler,), {"api": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self) -> "FakeLightspeedAPI":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delete_order(self, order_id: int) -> None:
+        with self.lock:
+            self.orders = [order for order in self.orders if order["id"] != order_id]
+
+    def filter_orders(self, params: Dict[str, List[str]]) -> List[dict]:
+        def bound(name: str) -> Optional[datetime]:
+            if name not in params:
+                return None
+            value = datetime.strptime(params[name][0], "%Y-%m-%d %H:%M:%S")
+            return value.replace(tzinfo=timezone.utc)
+
+        updated_min, updated_max = bound("updated_at_min"), bound("updated_at_max")
+        with self.lock:
+            orders = list(self.orders)
+        return [
+            order
+            for order in orders
+            if (updated_min is None or order_updated(order) >= updated_min)
+            and (updated_max is None or order_updated(order) <= updated_max)
+        ]
+
+    def pick_fault(self, path: str) -> Optional[str]:
+        with self.lock:
+            self.requests += 1
+            self.paths.append(path)
+            now = time.monotonic()
+            if now - self.window_start >= self.rate_window:
+                self.window_start = now
+                self.window_requests = 0
+            self.window_requests += 1
+            if self.rate_limit and self.window_requests > self.rate_limit:
+                fault: Optional[str] = "429"
+            else:
+                fault = None
+                for name, every in self.fault_every.items():
+                    if self.requests % every == 0:
+                        fault = name
+                        break
+            if fault:
+                self.faults[fault] = self.faults.get(fault, 0) + 1
+            return fault
+
+    def retry_after(self) -> str:
+        wait = self.rate_window - (time.monotonic() - self.window_start)
+        retry_time = datetime.now(timezone.utc) + timedelta(seconds=max(wait, 0))
+        return retry_time.isoformat()
+
+
+def order_updated(order: dict) -> datetime:
+    return datetime.fromisoformat(order["updatedAt"])
+
+
+class FakeLightspeedHandler(BaseHTTPRequestHandler):
+    """Answer requests for the `api` the handler class is made for."""
+
+    api: "FakeLightspeedAPI"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send_json(self, status: int, body: dict, headers=None) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        try:
+            self.respond()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on a slow response
+            pass
+
+    def respond(self) -> None:
+        fault = self.api.pick_fault(self.path)
+        if fault:
+            self.send_fault(fault)
+            if fault != "timeout":
+                return
+
+        url = urlparse(self.path)
+        if url.path.endswith("/count.json"):
+            resource = url.path.split("/")[-2]
+            count = len(self.api.orders) if resource == "orders" else 0
+            self.send_json(200, {"count": count})
+            return
+
+        params = parse_qs(url.query)
+        limit = int(params.get("limit", ["250"])[0])
+        page = int(params.get("page", ["1"])[0])
+        start = (page - 1) * limit
+        end = start + limit
+        orders = self.api.filter_orders(params)[start:end]
+        if self.api.on_page:
+            self.api.on_page(page)
+        self.send_json(200, {"orders": orders})
+
+    def send_fault(self, fault: str) -> None:
+        if fault == "drop":
+            self.close_connection = True
+        elif fault == "timeout":
+            time.sleep(self.api.timeout_seconds)
+        elif fault == "429":
+            self.send_json(429, {}, {"Retry-After": self.api.retry_after()})
+        else:
+            self.send_json(int(fault), {"error": fault})
@@ -0,0 +1,92 @@
+"""Benchmarks for record conformance."""
+
+import logging
+import time
+
+import pytest
+from singer_sdk.helpers._typing import conform_record_data_types
+
+from tap_lightspeed.conformance import RecordConformer
+from tap_lightspeed.streams import OrdersStream, VariantsStream
+
+SAMPLE_VALUES = {
+    "integer": 1,
+    "number": 1.5,
+    "string": "value",
+    "boolean": True,
+}
+
+
+def sample_record(schema: dict) -> dict:
+    """Build a record with a value for every property of the schema."""
+    record = {}
+    for name, prop in schema["properties"].items():
+        types = prop.get("type", ["string"])
+        types = [types] if isinstance(types, str) else types
+        if "properties" in prop:
+            record[name] = sample_record(prop)
+        elif "properties" in prop.get("items", {}):
+            record[name] = [sample_record(prop["items"])]
+        elif "array" in types:
+            record[name] = []
+        else:
+            record[name] = SAMPLE_VALUES.get(types[0], "value")
+    return record
+
+
+def test_conformance_benchmark():
+    """Fast conformance matches the SDK and reports the per-record overhead."""
+    logger = logging.getLogger("tap-lightspeed")
+    runs = 2000
+    for stream_type in (OrdersStream, VariantsStream):
+        schema = stream_type.schema
+        record = sample_record(schema)
+        conformer = RecordConformer(stream_type.name, schema, logger)
+        record[sorted(conformer.boolean_properties)[0]] = 0
+        record["unmapped"] = "value"
+        assert conformer.conform(dict(record)) == conform_record_data_types(
+            stream_type.name, dict(record), schema, logger
+        )
+        assert conformer.validate(conformer.conform(dict(record))) == []
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            conform_record_data_types(stream_type.name, record, schema, logger)
+        sdk = (time.perf_counter() - started) / runs
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            conformer.conform(record)
+        fast = (time.perf_counter() - started) / runs
+        print(
+            f"{stream_type.name}: sdk {sdk * 1e6:.1f} us/record, "
+            f"fast {fast * 1e6:.1f} us/record"
+        )
+
+
+@pytest.mark.parametrize("fast_conformance", [True, False])
+def test_records_are_sampled_for_validation(make_tap, fast_conformance):
+    tap = make_tap(fast_conformance=fast_conformance, validation_sample_rate=2)
+    stream = tap.streams["orders"]
+    record = sample_record(stream.schema)
+    for _ in range(4):
+        assert list(stream._generate_record_messages(dict(record)))
+    assert stream.validated_record_count == 4
+
+
+def test_validation_sample_benchmark(make_tap):
+    """Report the per-record cost of validating every record and 1 in 100."""
+    runs = 2000
+    timings = {}
+    for sample_rate in (1, 100):
+        stream = make_tap(validation_sample_rate=sample_rate).streams["orders"]
+        record = stream.record_conformer.conform(sample_record(stream.schema))
+        started = time.perf_counter()
+        for _ in range(runs):
+            stream.validate_record_sample(record)
+        timings[sample_rate] = (time.perf_counter() - started) / runs
+    print(
+        f"orders: validating every record {timings[1] * 1e6:.1f} us/record, "
+        f"1 in 100 {timings[100] * 1e6:.1f} us/record"
+    )
+    assert timings[100] < timings[1]
@@ -0,0 +1,38 @@
+"""Tests for dropping repeated records."""
+
+from tap_lightspeed.dedupe import RecentKeys
+
+
+def test_recent_keys_evicts_least_recently_seen():
+    keys = RecentKeys(2)
+    assert not keys.seen("a")
+    assert not keys.seen("b")
+    # Seeing "a" again makes "b" the least recently seen key
+    assert keys.seen("a")
+    assert not keys.seen("c")
+    assert list(keys.keys) == ["a", "c"]
+    assert not keys.seen("b")
+    assert keys.seen("c")
+    assert not keys.seen("a")
+
+
+def get_records(stream, records: list) -> list:
+    stream.request_records = lambda context: iter(records)
+    return list(stream.get_records(None))
+
+
+def test_stream_drops_records_repeated_with_same_updated_at(make_tap):
+    stream = make_tap(dedupe_records=True).streams["orders"]
+    first = {"id": 1, "updatedAt": "2022-01-01T00:00:00+00:00"}
+    newer = {"id": 1, "updatedAt": "2022-01-02T00:00:00+00:00"}
+    other = {"id": 2, "updatedAt": "2022-01-01T00:00:00+00:00"}
+    assert get_records(stream, [first, other, dict(first)]) == [first, other]
+    # A newer version of a record is kept, repeats stay dropped across syncs
+    assert get_records(stream, [newer, dict(first), dict(newer)]) == [newer]
+
+
+def test_stream_without_replication_key_is_not_deduped(make_tap):
+    stream = make_tap(dedupe_records=True).streams["shop"]
+    assert stream.replication_key is None
+    records = [{"id": 1, "title": "Shop"}, {"id": 1, "title": "Renamed shop"}]
+    assert get_records(stream, records) == records
@@ -0,0 +1,37 @@
+"""Tests for hard-delete reconciliation against the fake API."""
+
+from tap_lightspeed.tests.fake_api import FakeLightspeedAPI
+
+PAGE_SIZE = 10
+
+
+def scan_orders(api: FakeLightspeedAPI, make_tap) -> list:
+    tap = make_tap(
+        base_url=api.base_url,
+        throttle_seconds=0,
+        reconcile_deletes=True,
+        reconcile_streams=["orders"],
+    )
+    stream = tap.streams["deleted_records"]
+    stream.limit = PAGE_SIZE
+    return [record["id"] for record in stream.request_records({"resource": "orders"})]
+
+
+def test_deletes_during_scan_are_not_reported_for_live_ids(make_tap):
+    """An id is only reported once it is missing from two consecutive scans."""
+    with FakeLightspeedAPI(orders=35) as api:
+        assert scan_orders(api, make_tap) == []
+
+        def delete_during_scan(page: int) -> None:
+            if page == 1:
+                # Rows shift back a place, so the scan skips id 11 at the start
+                # of page 2, while id 3 was already read on page 1
+                api.delete_order(3)
+
+        api.on_page = delete_during_scan
+        assert scan_orders(api, make_tap) == []
+
+        api.on_page = None
+        assert scan_orders(api, make_tap) == []
+        assert scan_orders(api, make_tap) == [3]
+        assert scan_orders(api, make_tap) == []
@@ -0,0 +1,42 @@
+"""Throughput of the retry and throttling logic under injected API faults."""
+
+import time
+
+import pytest
+
+from tap_lightspeed.tests.fake_api import FakeLightspeedAPI
+
+ORDERS = 1000
+PAGE_SIZE = 50
+
+SCENARIOS = {
+    "no faults": {},
+    "rate limited": {"rate_limit": 10, "rate_window": 1.0},
+    "temporary 404 and 5xx": {"fault_every": {"404": 7, "500": 11}},
+    "connection drops": {"fault_every": {"drop": 6}},
+    "timeouts": {"fault_every": {"timeout": 8}, "timeout_seconds": 2.0},
+}
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_fault_injection_throughput(scenario, make_tap):
+    """Report records per second and recovery time; output must be complete."""
+    with FakeLightspeedAPI(orders=ORDERS, **SCENARIOS[scenario]) as api:
+        tap = make_tap(base_url=api.base_url, throttle_seconds=0, request_timeout=1)
+        stream = tap.streams["orders"]
+        stream.limit = PAGE_SIZE
+        started = time.perf_counter()
+        records = list(stream.get_records(None))
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"{scenario}: {len(records) / elapsed:.0f} records/s, "
+        f"{stream.recovery_seconds:.1f}s recovering, "
+        f"{api.requests} requests, faults {api.faults}"
+    )
+    assert sorted(record["id"] for record in records) == list(range(1, ORDERS + 1))
+    expected_faults = set(SCENARIOS[scenario].get("fault_every", {}))
+    if "rate_limit" in SCENARIOS[scenario]:
+        expected_faults.add("429")
+    assert set(api.faults) == expected_faults
+    assert (stream.recovery_seconds > 0) == bool(expected_faults)
@@ -0,0 +1,23 @@
+"""Tests for the id sets used by hard-delete reconciliation."""
+
+from tap_lightspeed.id_store import IdSetStore
+
+
+def test_missing_ids():
+    previous = IdSetStore.from_ids([9, 1, 5, 3, 7])
+    current = IdSetStore.from_ids([1, 2, 7, 9, 10])
+    assert list(IdSetStore.missing(previous, current)) == [3, 5]
+    assert list(IdSetStore.missing(previous, IdSetStore.from_ids([]))) == [
+        1,
+        3,
+        5,
+        7,
+        9,
+    ]
+
+
+def test_store_round_trip(tmp_path):
+    store = IdSetStore(tmp_path / "ids" / "orders.bin")
+    assert len(store.load()) == 0
+    store.save(IdSetStore.from_ids([3, 1, 2, 2]))
+    assert list(store.load()) == [1, 2, 3]
@@ -0,0 +1,37 @@
+"""Tests for the sync planner and dry runs."""
+
+import json
+
+from tap_lightspeed.planner import SyncPlanner
+from tap_lightspeed.tests.fake_api import FakeLightspeedAPI
+
+
+def test_plan_counts_pages_and_child_requests(make_tap):
+    with FakeLightspeedAPI(orders=600) as api:
+        tap = make_tap(base_url=api.base_url, throttle_seconds=0.5)
+        orders = tap.streams["orders"]
+        plan = SyncPlanner([orders, tap.streams["shop"]]).plan()
+
+    children = [child.name for child in orders.child_streams]
+    orders_plan, shop_plan = plan["streams"]
+    assert orders_plan["records"] == 600
+    assert orders_plan["child_streams"] == children
+    # 3 pages of 250 orders, then one request per order for each child stream
+    assert orders_plan["requests"] == 3 + 600 * len(children)
+    assert orders_plan["estimated_seconds"] == orders_plan["requests"] * 0.5
+    assert shop_plan["records"] is None and shop_plan["requests"] is None
+    assert plan["requests"] == orders_plan["requests"]
+    assert [path.split("?")[0] for path in api.paths] == ["/en/orders/count.json"]
+
+
+def test_dry_run_syncs_nothing(make_tap, capsys):
+    with FakeLightspeedAPI(orders=10) as api:
+        tap = make_tap(base_url=api.base_url, throttle_seconds=0, dry_run=True)
+        tap.sync_all()
+
+    # Only the plan is written to stdout, no RECORD or STATE messages
+    plan = json.loads(capsys.readouterr().out)
+    records = {stream["stream"]: stream["records"] for stream in plan["streams"]}
+    assert records["orders"] == 10
+    assert api.paths
+    assert all(path.split("?")[0].endswith("/count.json") for path in api.paths)
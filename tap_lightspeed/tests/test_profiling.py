@@ -0,0 +1,22 @@
+"""Tests for the sync profiler."""
+
+import re
+import time
+
+from tap_lightspeed.profiling import SyncProfiler
+
+
+def test_report_has_a_section_per_sync(tmp_path):
+    profiler = SyncProfiler(str(tmp_path / "report.txt"), sample_interval=0.01)
+    for section in ["orders", "orders (poll 1)"]:
+        with profiler.profile(section):
+            rows = [{"id": i, "title": str(i)} for i in range(20000)]
+            time.sleep(0.05)
+            del rows
+    report = profiler.write_report().read_text()
+
+    assert re.findall(r"^=== (.*) ===$", report, re.M) == ["orders", "orders (poll 1)"]
+    peaks = re.findall(r"^peak traced memory: ([\d.]+) MiB$", report, re.M)
+    assert len(peaks) == 2 and all(float(peak) > 0 for peak in peaks)
+    # The rows are freed before the block ends but are in the snapshot at peak
+    assert "test_profiling.py" in report.split("top allocation sites at peak")[1]
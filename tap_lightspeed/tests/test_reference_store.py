@@ -0,0 +1,61 @@
+"""Tests for the local product and variant store."""
+
+import threading
+
+from tap_lightspeed.reference_store import ReferenceStore
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    path = tmp_path / "reference.sqlite"
+    store = ReferenceStore(path)
+    store.batch_size = 2
+    store.upsert("products", {"id": 1, "title": "Shirt"})
+    store.upsert("products", {"id": 2, "title": "Shoes"})
+    store.upsert("products", {"id": 3, "title": "Socks"})
+    assert store.pending_rows == 1
+
+    reader = ReferenceStore(path)
+    assert reader.get("products", 2) == {"id": 2, "title": "Shoes"}
+    assert reader.get("products", 3) is None
+    store.commit()
+    assert reader.get("products", 3) == {"id": 3, "title": "Socks"}
+    store.close()
+    reader.close()
+
+
+def test_order_lines_are_enriched_from_any_thread(tmp_path, make_tap, monkeypatch):
+    store = ReferenceStore(tmp_path / "reference.sqlite")
+    store.upsert("variants", {"id": 7, "stockLevel": 3, "ean": "123"})
+    store.commit()
+    store.close()
+
+    tap = make_tap(enrich_order_lines={"variant": ["stockLevel"]})
+    stream = tap.streams["order_lines"]
+    line = {"id": 1, "variant": {"resource": {"id": 7}}}
+    monkeypatch.setattr(stream, "request_records", lambda context: [dict(line)])
+
+    # Watch polls with the scheduler sync the stream on a new thread each time
+    results = []
+    stores = []
+
+    def sync_order_lines() -> None:
+        for order_id in (1, 2):
+            results.extend(stream.get_records({"order_id": order_id}))
+            stores.append(stream.reference_store)
+
+    for _ in range(2):
+        thread = threading.Thread(target=sync_order_lines)
+        thread.start()
+        thread.join()
+    assert [record["variantDetails"] for record in results] == [{"stockLevel": 3}] * 4
+    # One store per thread, reused for every order
+    assert stores[0] is stores[1] and stores[2] is stores[3]
+    assert stores[0] is not stores[2]
+
+
+def test_reference_streams_sync_first(make_tap):
+    names = [s.name for s in make_tap().get_top_level_streams()]
+    assert names.index("orders") < names.index("products")
+    tap = make_tap(reference_store=True)
+    names = [s.name for s in tap.get_top_level_streams()]
+    assert names[:2] == ["products", "variants"]
@@ -0,0 +1,85 @@
+"""Tests for the shared request budget of the stream scheduler."""
+
+import json
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+from tap_lightspeed.exceptions import SyncDeadlineReached
+from tap_lightspeed.scheduler import RequestBudget
+from tap_lightspeed.tests.fake_api import FakeLightspeedAPI
+
+
+def test_requests_are_spaced_by_interval():
+    budget = RequestBudget(0.05)
+    started = time.monotonic()
+    for _ in range(3):
+        budget.acquire()
+    assert time.monotonic() - started >= 0.1
+
+
+def test_highest_priority_waiter_gets_next_slot():
+    budget = RequestBudget(0.3)
+    budget.acquire()
+    order = []
+
+    def acquire(name: str, priority: int) -> None:
+        budget.acquire(priority)
+        order.append(name)
+
+    low = threading.Thread(target=acquire, args=("low", 0))
+    high = threading.Thread(target=acquire, args=("high", 10))
+    low.start()
+    time.sleep(0.05)
+    high.start()
+    low.join()
+    high.join()
+    assert order == ["high", "low"]
+
+
+def test_deadline_stops_waiting_requests():
+    budget = RequestBudget(10, deadline=time.monotonic() + 0.1)
+    budget.acquire()
+    started = time.monotonic()
+    with pytest.raises(SyncDeadlineReached):
+        budget.acquire()
+    assert time.monotonic() - started < 1
+    assert budget.expired
+    assert budget._waiting == []
+    with pytest.raises(SyncDeadlineReached):
+        budget.acquire(priority=10)
+
+
+def test_deadline_keeps_bookmark_of_completed_windows(make_tap, capsys):
+    # Order i is updated at i:00, in 6 hour windows of 6 orders from 00:30
+    with FakeLightspeedAPI(orders=30, updated_step=timedelta(hours=1)) as api:
+        tap = make_tap(
+            base_url=api.base_url,
+            throttle_seconds=0,
+            start_date="2022-01-01T00:30:00Z",
+            end_date="2022-01-02T06:30:00Z",
+            sync_deadline_seconds=3600,
+            sync_window_days=0.25,
+        )
+        for stream in tap.streams.values():
+            stream.mask[()] = stream.name == "orders"
+        orders = tap.streams["orders"]
+        orders.limit = 4
+        pages = []
+
+        def on_page(page: int) -> None:
+            pages.append(page)
+            # Stop after the first page of the third window
+            if len(pages) == 5:
+                orders.request_budget.deadline = time.monotonic()
+
+        api.on_page = on_page
+        tap.sync_all()
+
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    records = [m["record"]["id"] for m in messages if m["type"] == "RECORD"]
+    assert records == list(range(1, 17))
+    bookmark = messages[-1]["value"]["bookmarks"]["orders"]
+    assert bookmark["replication_key_value"] == "2022-01-01T12:00:00+00:00"
@@ -0,0 +1,132 @@
+"""Tests for sharded extraction."""
+
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from tap_lightspeed.scheduler import RequestBudget
+from tap_lightspeed.sharding import ShardCoordinator
+from tap_lightspeed.tests.fake_api import FakeLightspeedAPI
+
+SHARD_CONFIG = {
+    "start_date": "2022-01-01T00:00:00Z",
+    "end_date": "2022-01-04T00:00:00Z",
+    "shard_workers": 3,
+    "shard_streams": ["orders"],
+}
+
+
+def get_coordinator(make_tap, **overrides) -> ShardCoordinator:
+    tap = make_tap(**SHARD_CONFIG, **overrides)
+    return ShardCoordinator(tap, tap.streams["orders"], 3)
+
+
+def test_windows_cover_the_bookmark_window(make_tap):
+    windows = get_coordinator(make_tap).get_windows()
+    day = [datetime(2022, 1, d, tzinfo=timezone.utc) for d in range(1, 5)]
+    assert windows == [(day[0], day[1]), (day[1], day[2]), (day[2], day[3])]
+
+
+def test_merge_bookmark_takes_latest_shard_bookmark(make_tap):
+    coordinator = get_coordinator(make_tap)
+
+    def state(value):
+        return {"bookmarks": {"orders": {"replication_key_value": value}}}
+
+    states = [
+        state("2022-01-01T20:00:00+00:00"),
+        state("2022-01-03T10:00:00+01:00"),
+        state("2022-01-03T09:30:00+00:00"),
+        {"bookmarks": {"orders": {}}},
+        {},
+    ]
+    assert coordinator.merge_bookmark(states) == "2022-01-03T09:30:00+00:00"
+    assert coordinator.merge_bookmark([{}]) is None
+
+
+def test_worker_config(make_tap, sample_config):
+    """Workers get their window and none of the coordinator-only settings."""
+    coordinator_only = {
+        "watch": True,
+        "watch_interval_seconds": 5,
+        "watch_streams": ["orders"],
+        "watch_max_polls": 2,
+        "adaptive_throttle": True,
+    }
+    config = get_coordinator(make_tap, **coordinator_only).get_worker_config(
+        (
+            datetime(2022, 1, 2, tzinfo=timezone.utc),
+            datetime(2022, 1, 3, tzinfo=timezone.utc),
+        )
+    )
+    assert config["start_date"] == "2022-01-02T00:00:00+00:00"
+    assert config["end_date"] == "2022-01-03 00:00:00"
+    assert config["shard_stream"] == "orders"
+    assert config["throttle_seconds"] == 1.3 * 3
+    assert config["base_url"] == sample_config["base_url"]
+    for setting in [*coordinator_only, "shard_workers", "shard_streams"]:
+        assert setting not in config
+
+
+def sync_shards(make_tap, capsys, **api_options) -> tuple:
+    """Sync 9 hourly updated orders in 3 shards against the fake API."""
+    with FakeLightspeedAPI(
+        orders=9, updated_step=timedelta(hours=1), **api_options
+    ) as api:
+        tap = make_tap(
+            **{
+                **SHARD_CONFIG,
+                "base_url": api.base_url,
+                "throttle_seconds": 0,
+                "start_date": "2022-01-01T00:30:00Z",
+                "end_date": "2022-01-01T09:30:00Z",
+            }
+        )
+        orders = tap.streams["orders"]
+        coordinator = tap.get_shard_coordinator(orders)
+        error = None
+        try:
+            coordinator.run()
+        except RuntimeError as ex:
+            error = ex
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return orders, messages, error
+
+
+@pytest.fixture
+def worker_path(monkeypatch):
+    """Let the worker processes import the package from this checkout."""
+    monkeypatch.setenv("PYTHONPATH", str(Path(__file__).parents[2]))
+
+
+def test_shards_forward_records_and_merge_bookmark(make_tap, capsys, worker_path):
+    orders, messages, error = sync_shards(make_tap, capsys)
+
+    assert error is None
+    records = [m["record"]["id"] for m in messages if m["type"] == "RECORD"]
+    assert sorted(records) == list(range(1, 10))
+    assert messages[-1]["type"] == "STATE"
+    bookmark = messages[-1]["value"]["bookmarks"]["orders"]
+    assert bookmark["replication_key_value"] == "2022-01-01T09:00:00+00:00"
+    assert (
+        orders.stream_state["replication_key_value"]
+        == bookmark["replication_key_value"]
+    )
+
+
+def test_failed_shards_keep_the_bookmark(make_tap, capsys, worker_path):
+    orders, messages, error = sync_shards(make_tap, capsys, fault_every={"401": 1})
+
+    assert str(error) == "3 of 3 shards of 'orders' failed, bookmark not advanced."
+    assert [m for m in messages if m["type"] in ("RECORD", "STATE")] == []
+    assert "replication_key_value" not in orders.stream_state
+
+
+def test_scheduled_streams_are_not_sharded(make_tap):
+    tap = make_tap(**SHARD_CONFIG)
+    orders = tap.streams["orders"]
+    assert tap.get_shard_coordinator(orders) is not None
+    orders.request_budget = RequestBudget(0)
+    assert tap.get_shard_coordinator(orders) is None
@@ -0,0 +1,76 @@
+"""Startup benchmarks for tap-lightspeed."""
+
+import inspect
+import json
+import subprocess
+import sys
+import time
+
+from tap_lightspeed import streams
+from tap_lightspeed.client import LightspeedStream
+
+LAZY_MODULES = [
+    "tap_lightspeed.streams",
+    "tap_lightspeed.planner",
+    "tap_lightspeed.profiling",
+    "tap_lightspeed.scheduler",
+    "tap_lightspeed.sharding",
+    "tap_lightspeed.state",
+    "tap_lightspeed.throttle",
+]
+
+
+def test_stream_registry_is_complete():
+    """Every stream class defined in streams.py is registered."""
+    defined = {
+        cls
+        for _, cls in inspect.getmembers(streams, inspect.isclass)
+        if issubclass(cls, LightspeedStream) and cls is not LightspeedStream
+    }
+    assert defined == set(streams.STREAM_TYPES) | {streams.DeletedRecordsStream}
+
+
+def run_tap(*args: str) -> subprocess.CompletedProcess:
+    """Run the tap in a fresh interpreter with import timing enabled."""
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "tap_lightspeed.tap", *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def cumulative_import_us(importtime: str, module: str) -> int:
+    """Return the cumulative import time of a module from `-X importtime` output."""
+    for line in importtime.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    return 0
+
+
+def test_startup_benchmark(tmp_path, sample_config):
+    """Measure cold process start of `--about` and `--discover`."""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(sample_config))
+    runs = 5
+    commands = {
+        "--about": ["--about"],
+        "--discover": ["--config", str(config_path), "--discover"],
+    }
+    for name, args in commands.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = run_tap(*args)
+            timings.append(time.perf_counter() - started)
+        streams_us = cumulative_import_us(result.stderr, "tap_lightspeed.streams")
+        print(
+            f"tap {name}: {min(timings) * 1000:.0f} ms cold start, "
+            f"tap_lightspeed.streams import {streams_us / 1000:.1f} ms"
+        )
+        if name == "--about":
+            # The stream schemas and sync helpers are only loaded when needed
+            for module in LAZY_MODULES:
+                assert cumulative_import_us(result.stderr, module) == 0, module
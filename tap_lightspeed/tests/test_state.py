@@ -0,0 +1,39 @@
+"""Tests for coalesced STATE emission."""
+
+import json
+import time
+
+from tap_lightspeed.state import StateWriter
+
+
+def emitted_states(capsys) -> list:
+    lines = capsys.readouterr().out.splitlines()
+    return [json.loads(line)["value"] for line in lines]
+
+
+def test_states_are_coalesced_by_record_count(capsys):
+    writer = StateWriter(interval_seconds=3600, interval_records=3)
+    writer.write({"n": 1})
+    writer.records_since_emit = 2
+    writer.write({"n": 2})
+    writer.records_since_emit = 3
+    writer.write({"n": 3})
+    writer.records_since_emit = 1
+    writer.write({"n": 4})
+    writer.write({"n": 5}, force=True)
+    assert emitted_states(capsys) == [{"n": 3}, {"n": 5}]
+    assert writer.records_since_emit == 0
+
+
+def test_states_are_coalesced_by_time(capsys):
+    writer = StateWriter(interval_seconds=0.1)
+    writer.write({"n": 1})
+    time.sleep(0.1)
+    writer.write({"n": 2})
+    writer.write({"n": 3})
+    assert emitted_states(capsys) == [{"n": 2}]
+
+    writer = StateWriter()
+    writer.write({"n": 4})
+    writer.write({"n": 5})
+    assert emitted_states(capsys) == [{"n": 4}, {"n": 5}]
@@ -0,0 +1,66 @@
+"""Tests for suppressing unchanged products and variants."""
+
+from tap_lightspeed.hash_store import ContentHashStore
+
+
+def get_products_stream(make_tap):
+    return make_tap(suppress_unchanged=True).streams["products"]
+
+
+def test_unchanged_record_is_suppressed_and_advances_bookmark(make_tap):
+    first = [
+        {"id": 1, "updatedAt": "2022-01-01T00:00:00+00:00", "title": "Shirt"},
+        {"id": 2, "updatedAt": "2022-01-02T00:00:00+00:00", "title": "Shoes"},
+    ]
+    stream = get_products_stream(make_tap)
+    assert list(stream.drop_unchanged_records(iter(first), None)) == first
+
+    # Only updatedAt changed for product 1, product 2 got a new title
+    second = [
+        {"id": 1, "updatedAt": "2022-02-01T00:00:00+00:00", "title": "Shirt"},
+        {"id": 2, "updatedAt": "2022-01-15T00:00:00+00:00", "title": "Boots"},
+    ]
+    stream = get_products_stream(make_tap)
+    assert list(stream.drop_unchanged_records(iter(second), None)) == [second[1]]
+    progress = stream.get_context_state(None)["progress_markers"]
+    assert progress["replication_key_value"] == "2022-02-01T00:00:00+00:00"
+
+
+def test_only_emitted_fields_are_compared(make_tap):
+    updated = "2022-01-01T00:00:00+00:00"
+    first = [{"id": 1, "updatedAt": updated, "title": "Shirt", "unknownField": 1}]
+    stream = get_products_stream(make_tap)
+    assert list(stream.drop_unchanged_records(iter(first), None)) == first
+
+    # Fields missing from the schema are never emitted, so they don't count
+    second = [{"id": 1, "updatedAt": updated, "title": "Shirt", "unknownField": 2}]
+    stream = get_products_stream(make_tap)
+    assert list(stream.drop_unchanged_records(iter(second), None)) == []
+
+
+def test_deselected_stream_keeps_no_hashes(make_tap, tmp_path):
+    records = [{"id": 1, "updatedAt": "2022-01-01T00:00:00+00:00", "title": "Shirt"}]
+    stream = get_products_stream(make_tap)
+    # Synced only for its child streams
+    stream.mask[()] = False
+    stream.request_records = lambda context: iter(records)
+    assert list(stream.get_records(None)) == records
+    assert list(stream.get_records(None)) == records
+    assert not (tmp_path / "content_hashes.sqlite").exists()
+
+
+def test_hashes_are_only_stored_on_commit(tmp_path):
+    path = tmp_path / "content_hashes.sqlite"
+    digest = ContentHashStore.hash_record({"title": "Shirt"})
+    store = ContentHashStore(path)
+    assert not store.is_unchanged("products", 1, digest)
+    store.close()
+
+    store = ContentHashStore(path)
+    assert not store.is_unchanged("products", 1, digest)
+    store.commit()
+    store.close()
+
+    store = ContentHashStore(path)
+    assert store.is_unchanged("products", 1, digest)
+    store.close()
@@ -0,0 +1,94 @@
+"""Tests for the adaptive request spacing."""
+
+import pytest
+
+from tap_lightspeed.tests.fake_api import FakeLightspeedAPI
+from tap_lightspeed.throttle import AdaptiveThrottle, AdaptiveThrottleRegistry
+
+
+def test_healthy_responses_increase_rate_additively():
+    throttle = AdaptiveThrottle(1.0, increase=0.5)
+    throttle.observe(200, 0.1)
+    assert throttle.interval == pytest.approx(1 / 1.5)
+    throttle.observe(200, 0.1)
+    assert throttle.interval == pytest.approx(1 / 2.0)
+
+
+@pytest.mark.parametrize("status_code, latency", [(429, 0.1), (503, 0.1), (200, 0.5)])
+def test_overload_halves_rate(status_code, latency):
+    throttle = AdaptiveThrottle(1.0, increase=0)
+    throttle.observe(200, 0.1)
+    throttle.observe(status_code, latency)
+    assert throttle.interval == pytest.approx(2.0)
+
+
+def test_failures_halve_rate_within_bounds():
+    throttle = AdaptiveThrottle(10.0, min_interval=0.5, max_interval=30.0)
+    throttle.observe_failure()
+    assert throttle.interval == 20.0
+    throttle.observe_failure()
+    assert throttle.interval == 30.0
+
+    throttle = AdaptiveThrottle(0.6, min_interval=0.5, increase=10)
+    throttle.observe(200, 0.1)
+    assert throttle.interval == 0.5
+
+
+def test_registry_round_trip(tmp_path):
+    path = tmp_path / "throttle.json"
+    registry = AdaptiveThrottleRegistry(path, default_interval=1.3)
+    registry.get("shop:orders").observe_failure()
+    registry.save()
+    assert [p.name for p in tmp_path.iterdir()] == ["throttle.json"]
+
+    registry = AdaptiveThrottleRegistry(path, default_interval=1.3)
+    assert registry.get("shop:orders").interval == 2.6
+    assert registry.get("shop:products").interval == 1.3
+
+
+def test_endpoint_family_comes_from_request_url(make_tap):
+    tap = make_tap(adaptive_throttle=True, reconcile_deletes=True)
+    stream = tap.streams["deleted_records"]
+    orders = tap.streams["order_lines"].get_adaptive_throttle(
+        "https://api.webshopapp.com/en/orders/1/products.json"
+    )
+    assert orders is not None
+    assert orders is stream.get_adaptive_throttle(
+        "https://api.webshopapp.com/en/orders.json?fields=id&page=2"
+    )
+    assert list(tap.throttle_registry.throttles) == [f"{stream.throttle_shop}:orders"]
+
+
+def test_dropped_connections_slow_down(make_tap):
+    with FakeLightspeedAPI(orders=10, fault_every={"drop": 1000}) as api:
+        api.requests = 999
+        tap = make_tap(
+            base_url=api.base_url,
+            throttle_seconds=0.2,
+            adaptive_throttle=True,
+            min_throttle_seconds=0.2,
+        )
+        stream = tap.streams["orders"]
+        assert len(list(stream.get_records(None))) == 10
+    assert api.faults == {"drop": 1}
+    throttle = tap.throttle_registry.throttles[f"{stream.throttle_shop}:orders"]
+    assert throttle.interval == pytest.approx(0.4 / (1 + 0.4 * 0.05))
+
+
+def test_scheduled_streams_learn_nothing(make_tap, tmp_path):
+    with FakeLightspeedAPI(orders=10) as api:
+        tap = make_tap(
+            base_url=api.base_url,
+            throttle_seconds=0,
+            adaptive_throttle=True,
+            max_concurrent_streams=2,
+        )
+        for stream in tap.streams.values():
+            stream.mask[()] = stream.name == "orders"
+        tap.sync_all()
+
+    orders = tap.streams["orders"]
+    assert orders.request_budget is not None
+    assert orders.get_adaptive_throttle(f"{api.base_url}/en/orders.json") is None
+    assert tap.throttle_registry.throttles == {}
+    assert not (tmp_path / "throttle.json").exists()
@@ -0,0 +1,46 @@
+"""Tests for watch mode."""
+
+import json
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from tap_lightspeed.tests.fake_api import FakeLightspeedAPI
+
+
+def test_polls_start_from_the_previous_bookmark(make_tap, capsys):
+    with FakeLightspeedAPI(orders=3, updated_step=timedelta(hours=1)) as api:
+        tap = make_tap(
+            base_url=api.base_url,
+            throttle_seconds=0,
+            start_date="2022-01-01T00:00:00Z",
+            watch=True,
+            watch_interval_seconds=0,
+            watch_max_polls=2,
+        )
+        for stream in tap.streams.values():
+            stream.mask[()] = stream.name == "orders"
+        pages = []
+
+        def on_page(page: int) -> None:
+            pages.append(page)
+            # Order 1 changes after the first poll read the orders
+            if len(pages) == 2:
+                api.orders[0]["updatedAt"] = "2022-01-01T05:00:00+00:00"
+
+        api.on_page = on_page
+        tap.sync_all()
+
+    updated_at_min = [
+        parse_qs(urlparse(path).query)["updated_at_min"][0] for path in api.paths
+    ]
+    # The initial sync, then two polls from the bookmark the previous one finalized
+    assert updated_at_min == [
+        "2022-01-01 00:00:00",
+        "2022-01-01 03:00:00",
+        "2022-01-01 03:00:00",
+    ]
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    records = [m["record"]["id"] for m in messages if m["type"] == "RECORD"]
+    assert records == [1, 2, 3, 3, 1, 3]
+    bookmark = messages[-1]["value"]["bookmarks"]["orders"]
+    assert bookmark["replication_key_value"] == "2022-01-01T05:00:00+00:00"
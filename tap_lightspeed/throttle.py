@@ -0,0 +1,95 @@
+"""Self-tuning request spacing per shop and endpoint family."""
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class AdaptiveThrottle:
+    """Space requests with additive increase, multiplicative decrease of the rate.
+
+    Healthy responses raise the request rate by `increase` requests per second.
+    A 429, a 5xx, a latency above twice the running average, a timeout or a
+    dropped connection halves it.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        min_interval: float = 0.1,
+        max_interval: float = 30.0,
+        increase: float = 0.05,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.increase = increase
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.latency: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def observe(self, status_code: int, latency: float) -> None:
+        """Update the spacing from the outcome of one request."""
+        with self.lock:
+            overloaded = status_code == 429 or status_code >= 500
+            slow = self.latency is not None and latency > 2 * self.latency
+            if overloaded or slow:
+                self.interval = min(self.interval * 2, self.max_interval)
+            elif status_code < 400:
+                rate = 1 / self.interval + self.increase
+                self.interval = max(1 / rate, self.min_interval)
+
+            if status_code < 400:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency = 0.8 * self.latency + 0.2 * latency
+
+    def observe_failure(self) -> None:
+        """Slow down after a request that got no response."""
+        with self.lock:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+
+class AdaptiveThrottleRegistry:
+    """Hand out one throttle per shop and endpoint family and persist them."""
+
+    def __init__(
+        self, path: Path, default_interval: float, min_interval: float = 0.1
+    ) -> None:
+        self.path = Path(path)
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.throttles: Dict[str, AdaptiveThrottle] = {}
+        self.lock = threading.Lock()
+        self.learned: Dict[str, float] = {}
+        if self.path.exists():
+            self.learned = json.loads(self.path.read_text())
+
+    def get(self, key: str) -> AdaptiveThrottle:
+        """Return the throttle for a key, starting from its learned spacing."""
+        with self.lock:
+            if key not in self.throttles:
+                self.throttles[key] = AdaptiveThrottle(
+                    self.learned.get(key, self.default_interval),
+                    min_interval=self.min_interval,
+                )
+            return self.throttles[key]
+
+    def save(self) -> None:
+        """Persist the current spacing of every throttle."""
+        with self.lock:
+            for key, throttle in self.throttles.items():
+                self.learned[key] = throttle.interval
+            if not self.throttles:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique per writer, so concurrent runs don't replace each other's file
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.path.parent, prefix=self.path.name, suffix=".tmp"
+            )
+            with os.fdopen(fd, "w") as tmp_file:
+                tmp_file.write(json.dumps(self.learned, indent=2, sort_keys=True))
+            os.replace(tmp_path, self.path)